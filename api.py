@@ -1,15 +1,25 @@
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, field_validator
 from typing import List, Optional, Dict
+from datetime import date
 import logging
 import time
 import uuid
 import sys
 import os
+import asyncio
+import queue
 from contextlib import asynccontextmanager
 
 from tariff_engine.chatbot import PortDuesChatbot
 from tariff_engine.constants import DUES_TYPES
+from tariff_engine.registry import parse_call_date
+from tariff_engine.resolver import resolve_dues
+from tariff_engine.profiling import PROFILING_ENABLED, profile_request
+from tariff_engine.admission import (
+    AdmissionController, Deadline, DeadlineExceeded, Overloaded, DEFAULT_TIMEOUT, RETRY_AFTER,
+)
 
 # Set console encoding to UTF-8 for Windows compatibility
 if os.name == 'nt':  # Windows
@@ -58,9 +68,17 @@ app = FastAPI(
 class TariffRequest(BaseModel):
     vessel_info: str
     requested_dues: Optional[List[str]] = None  # empty = all
+    call_date: Optional[date] = None  # picks the tariff version; defaults to the arrival date in vessel_info
+
+    @field_validator("requested_dues")
+    @classmethod
+    def canonical_dues(cls, value):
+        # Reject unknown names here, before the request takes a slot or an LLM call
+        return resolve_dues(value) if value else value
 
 class TariffResponse(BaseModel):
     results: Dict[str, str]  # { "Port Dues": "ZAR 199,549.22", ... }
+    tariff_version: Optional[str] = None
 
 # ---------- Request logging middleware ----------
 @app.middleware("http")
@@ -79,10 +97,17 @@ async def log_requests(request: Request, call_next):
     
     return response
 
-# ---------- Chatbot instance ----------
+# ---------- Chatbot instances ----------
 logger.info("[CHATBOT] Initializing PortDuesChatbot instance...")
-chatbot = PortDuesChatbot()  # reused for every request
-logger.info("[CHATBOT] Chatbot initialized successfully")
+chatbot = PortDuesChatbot()  # shares its client and router with the pool below
+admission = AdmissionController()
+
+# One chatbot per in-flight slot, since a chatbot holds the vessel data of its request
+chatbot_pool: "queue.Queue[PortDuesChatbot]" = queue.Queue()
+chatbot_pool.put(chatbot)
+for _ in range(admission.max_in_flight - 1):
+    chatbot_pool.put(PortDuesChatbot(client=chatbot.client, router=chatbot.router, registry=chatbot.registry))
+logger.info(f"[CHATBOT] Chatbot pool initialized with {admission.max_in_flight} instances")
 
 # ---------- Routes ----------
 @app.get("/", tags=["health"])
@@ -90,10 +115,76 @@ def root():
     logger.info("[HEALTH] Health check endpoint accessed")
     return {"status": "ok"}
 
+@app.get("/metrics", tags=["health"])
+def metrics():
+    return {"routing": chatbot.router.snapshot(), "admission": admission.snapshot(), "tariffs": chatbot.registry.snapshot()}
+
+def _request_timeout(request: Request) -> Optional[float]:
+    """
+    Seconds the client is willing to wait, from the X-Request-Timeout header
+    """
+    header = request.headers.get("x-request-timeout")
+    if header:
+        try:
+            timeout = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds")
+        if timeout <= 0:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be positive")
+        return min(timeout, DEFAULT_TIMEOUT) if DEFAULT_TIMEOUT else timeout
+    return DEFAULT_TIMEOUT or None
+
 @app.post("/calculate-tariffs", response_model=TariffResponse, tags=["tariffs"])
-def calculate_tariffs(payload: TariffRequest):
+async def calculate_tariffs(payload: TariffRequest, request: Request, response: Response):
     request_id = str(uuid.uuid4())[:8]
-    
+    deadline = Deadline(_request_timeout(request))
+    profile = request.headers.get("x-profile", "").lower() in ("1", "true", "yes")
+    if profile and not PROFILING_ENABLED:
+        logger.warning(f"[PROFILE] [{request_id}] X-Profile ignored: PROFILING_ENABLED is off")
+        profile = False
+    report = {}
+
+    try:
+        async with admission.slot(deadline):
+            task = asyncio.ensure_future(run_in_threadpool(_run_calculation, payload, request_id, deadline, profile, report))
+            # Abandon the work if the caller goes away; the slot is held until the thread stops
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.5)
+                if not task.done() and not deadline.cancelled and await request.is_disconnected():
+                    logger.warning(f"[ABANDON] [{request_id}] Client disconnected, abandoning calculation")
+                    deadline.cancel()
+            result = task.result()
+            if report.get("skipped"):
+                logger.warning(f"[PROFILE] [{request_id}] X-Profile skipped: {report['skipped']}")
+                response.headers["X-Profile-Skipped"] = report["skipped"]
+            elif report:
+                logger.info(f"[PROFILE] [{request_id}] Report written to {report['summary']}")
+                response.headers["X-Profile-Report"] = report["summary"]
+            return result
+    except Overloaded as e:
+        logger.warning(f"[SHED] [{request_id}] {e} - {admission.snapshot()}")
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": str(RETRY_AFTER)})
+    except DeadlineExceeded as e:
+        admission.record_abandoned()
+        logger.warning(f"[ABANDON] [{request_id}] {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+
+def _run_calculation(payload: TariffRequest, request_id: str, deadline: Deadline, profile: bool = False, report: Optional[dict] = None):
+    chatbot = chatbot_pool.get()
+    profile_report = {}
+    # Memory figures are process-wide, so record how much else was running alongside
+    others_at_start = max(admission.in_flight - 1, 0)
+    note = lambda: (f"memory figures are process-wide; {others_at_start} other calculation(s) were in flight "
+                    f"at the start and {max(admission.in_flight - 1, 0)} at the end")
+    try:
+        with profile_request(request_id, enabled=profile, note=note) as profile_report:
+            return _calculate(chatbot, payload, request_id, deadline)
+    finally:
+        chatbot_pool.put(chatbot)
+        if report is not None:
+            report.update(profile_report)  # filled in once the profiled block has exited
+
+def _calculate(chatbot: PortDuesChatbot, payload: TariffRequest, request_id: str, deadline: Deadline):
     try:
         # Log request details
         vessel_lines = payload.vessel_info.split('\n')
@@ -110,13 +201,19 @@ def calculate_tariffs(payload: TariffRequest):
         response_msg = chatbot.set_vessel_data(payload.vessel_info)
         logger.debug(f"   > {response_msg}")
 
-        # 2) Which dues?
+        # 2) Which tariff version?
+        call_date = payload.call_date or parse_call_date(payload.vessel_info)
+        if chatbot.registry.resolve(call_date) is None:
+            logger.error(f"[ERROR] [{request_id}] No tariff version covers call date {call_date}")
+            raise HTTPException(status_code=422, detail=f"No tariff version covers the call date {call_date}")
+
+        # 3) Which dues?
         dues = payload.requested_dues or DUES_TYPES
         logger.info(f"[DUES] [{request_id}] Calculating {len(dues)} due types: {', '.join(dues)}")
 
-        # 3) Calculate
+        # 4) Calculate
         logger.info(f"[COMPUTE] [{request_id}] Starting chatbot calculation...")
-        raw_output = chatbot.calculate_specific_dues(dues)
+        raw_output = chatbot.calculate_specific_dues(dues, deadline=deadline, call_date=call_date)
         
         if not raw_output:
             logger.error(f"[ERROR] [{request_id}] Chatbot returned empty output")
@@ -124,7 +221,7 @@ def calculate_tariffs(payload: TariffRequest):
         
         logger.debug(f"[OUTPUT] [{request_id}] Raw chatbot output: {raw_output[:100]}...")
 
-        # 4) Parse results
+        # 5) Parse results
         logger.info(f"[PARSE] [{request_id}] Parsing calculation results...")
         results: Dict[str, str] = {}
         
@@ -150,10 +247,13 @@ def calculate_tariffs(payload: TariffRequest):
         for tariff_name, amount in results.items():
             logger.info(f"   > {tariff_name}: {amount}")
 
-        return {"results": results}
+        tariff_version = chatbot.tariff_version.name if chatbot.tariff_version else None
+        logger.info(f"   > Tariff version: {tariff_version}")
+
+        return {"results": results, "tariff_version": tariff_version}
         
-    except HTTPException:
-        raise  # Re-raise HTTP exceptions as-is
+    except (HTTPException, DeadlineExceeded):
+        raise  # Re-raise HTTP exceptions and deadline aborts as-is
     except Exception as e:
         logger.error(f"[FATAL] [{request_id}] Unexpected error during calculation: {str(e)}")
         logger.exception(f"   > Full traceback:")
@@ -1,4 +1,5 @@
 import sys, os
+import argparse
 import json
 from google import genai
 from google.genai import types
@@ -12,12 +13,70 @@ from tariff_engine.chatbot import PortDuesChatbot
 # Load environment variables
 load_dotenv()
 
+def batch(args):
+    """
+    Quote every vessel record in a CSV/JSONL file
+    """
+    from tariff_engine.batch import run_batch
+    from tariff_engine.resolver import UnknownDuesError, resolve_dues, split_dues_text
+
+    requested_dues = None
+    if args.dues:
+        try:
+            requested_dues = resolve_dues(split_dues_text(args.dues))
+        except UnknownDuesError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+    completed, failed = run_batch(
+        args.input,
+        args.output,
+        workers=args.workers,
+        use_processes=args.processes,
+        requested_dues=requested_dues,
+        resume=not args.no_resume,
+    )
+    print(f"✅ Batch finished: {completed} records written to {args.output} ({failed} failed)")
+
+def profiles(args):
+    """
+    Summarize saved profiling reports
+    """
+    from tariff_engine.profiling import summarize
+
+    print(summarize(args.path, sort=args.sort, limit=args.limit))
+
 def main():
     """
-    Start the chatbot
+    Start the chatbot, run a batch file with 'main.py batch', or read profiles with 'main.py profiles'
     """
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        parser = argparse.ArgumentParser(prog="main.py batch", description="Quote vessel records from a CSV or JSONL file.")
+        parser.add_argument("input", help="CSV or JSONL file with one vessel call per record")
+        parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL results file, also used as the resume checkpoint")
+        parser.add_argument("-w", "--workers", type=int, default=4, help="Number of concurrent workers")
+        parser.add_argument("--processes", action="store_true", help="Use a process pool instead of a thread pool")
+        parser.add_argument("--dues", help="Comma-separated dues for records that don't specify their own (default: all)")
+        parser.add_argument("--no-resume", action="store_true", help="Overwrite the output file instead of resuming from it")
+        batch(parser.parse_args(sys.argv[2:]))
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "profiles":
+        from tariff_engine.profiling import PROFILE_DIR, PROFILE_TOP
+
+        parser = argparse.ArgumentParser(prog="main.py profiles", description="List profiling reports, or summarize one.")
+        parser.add_argument("path", nargs="?", default=PROFILE_DIR, help="Report directory, or a .prof/.txt report")
+        parser.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, calls, ...)")
+        parser.add_argument("--limit", type=int, default=PROFILE_TOP, help="Number of functions to show")
+        profiles(parser.parse_args(sys.argv[2:]))
+        return
+
+    parser = argparse.ArgumentParser(prog="main.py", description="Interactive port dues chatbot.")
+    parser.add_argument("--profile", action="store_true", help="Profile each 'calculate' command (cProfile + tracemalloc)")
+    args = parser.parse_args()
+
     chatbot = PortDuesChatbot()
+    chatbot.profile = args.profile
     chatbot.chat()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
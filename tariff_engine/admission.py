@@ -0,0 +1,130 @@
+"""
+Admission control and deadlines for the tariff API
+
+A bounded number of calculations run at once, a short queue waits behind
+them and everything else is shed immediately. Each request carries a Deadline:
+it bounds the queue wait and the chatbot checks it before every model call.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+MAX_IN_FLIGHT = int(os.getenv("API_MAX_IN_FLIGHT", "4"))
+MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "8"))
+QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "10"))  # seconds a request may wait for a slot
+RETRY_AFTER = int(os.getenv("API_RETRY_AFTER", "5"))  # seconds, sent in the Retry-After header
+DEFAULT_TIMEOUT = float(os.getenv("API_DEFAULT_TIMEOUT", "120"))  # used when the client sends no deadline
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a calculation runs past its deadline or its caller has gone
+    """
+
+
+class Deadline:
+    """
+    Monotonic deadline that can also be cancelled when the caller disconnects
+    """
+    def __init__(self, timeout=None):
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        """
+        Seconds left, or None if there is no time limit
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.cancelled or self.remaining() == 0.0
+
+    def check(self):
+        if self.cancelled:
+            raise DeadlineExceeded("Caller disconnected")
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded("Deadline exceeded")
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit with a short waiting queue; counters for /metrics
+    """
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.abandoned = 0
+
+    @asynccontextmanager
+    async def slot(self, deadline=None):
+        """
+        Hold one of the in-flight slots, waiting briefly in the queue if needed;
+        never waits past the request's deadline
+        """
+        # Check and reserve a position before the first await, so a burst of
+        # requests arriving together cannot all slip into the queue
+        if self.in_flight + self.waiting >= self.max_in_flight + self.max_queue:
+            self.shed += 1
+            raise Overloaded("Queue is full")
+
+        timeout = self.queue_timeout
+        remaining = deadline.remaining() if deadline else None
+        deadline_bound = remaining is not None and (timeout is None or remaining < timeout)
+        if deadline_bound:
+            timeout = remaining
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if deadline_bound:
+                raise DeadlineExceeded("Deadline exceeded while queued")
+            self.shed += 1
+            raise Overloaded("Timed out waiting for a slot")
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def record_abandoned(self):
+        self.abandoned += 1
+
+    def snapshot(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "abandoned": self.abandoned,
+        }
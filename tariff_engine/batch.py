@@ -0,0 +1,289 @@
+"""
+File-driven batch mode for the Port Dues Chatbot
+
+Streams vessel records from CSV/JSONL, calculates them on a thread or process
+pool and appends one JSON line per record to the output file. The output file
+doubles as the checkpoint: on resume, records already calculated successfully
+are skipped and failed ones are retried (the latest line per index wins).
+"""
+import concurrent.futures
+import contextlib
+import csv
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+
+from tariff_engine.constants import DUES_TYPES
+from tariff_engine.registry import parse_call_date, parse_date
+from tariff_engine.resolver import resolve_dues
+
+_local = threading.local()
+_shared = {}  # client, router and registry shared by the worker threads of a run
+
+
+def _get_chatbot():
+    """
+    One chatbot per worker thread/process, since the chatbot keeps vessel state;
+    threads share one client, router and tariff registry (and so one rules cache)
+    """
+    chatbot = getattr(_local, "chatbot", None)
+    if chatbot is None:
+        from tariff_engine.chatbot import PortDuesChatbot
+        chatbot = PortDuesChatbot(**_shared)
+        _local.chatbot = chatbot
+    return chatbot
+
+
+def _init_process_worker():
+    """
+    Process-pool initializer: keep chatbot progress prints off the terminal and
+    build this process's own client, router and registry
+    """
+    _shared.clear()
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+
+def _split_dues(value):
+    if not value:
+        return None
+    if isinstance(value, list):
+        return [due.strip() for due in value if due and due.strip()] or None
+    return [due.strip() for due in value.replace(";", ",").split(",") if due.strip()] or None
+
+
+def _csv_row_to_record(row):
+    """
+    Use a 'vessel_info' column if present, otherwise render the columns as 'Key: value' lines
+    """
+    row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    vessel_info = row.pop("vessel_info", "")
+    requested_dues = _split_dues(row.pop("requested_dues", ""))
+    call_date = row.pop("call_date", "") or None
+    record_id = row.get("id") or row.get("call_id")
+    if not vessel_info:
+        vessel_info = "\n".join(f"{key}: {value}" for key, value in row.items() if value and key not in ("id", "call_id"))
+    return {"id": record_id, "vessel_info": vessel_info, "requested_dues": requested_dues, "call_date": call_date}
+
+
+def iter_records(path):
+    """
+    Lazily yield (index, record) from a .csv or .jsonl file
+    """
+    path = pathlib.Path(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            for index, row in enumerate(csv.DictReader(f)):
+                yield index, _csv_row_to_record(row)
+        else:
+            index = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                    if not isinstance(data, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    # Reported in the output like any other failed record
+                    yield index, {"id": None, "error": f"Invalid JSON record: {e}"}
+                    index += 1
+                    continue
+                yield index, {
+                    "id": data.get("id") or data.get("call_id"),
+                    "vessel_info": data.get("vessel_info", ""),
+                    "requested_dues": _split_dues(data.get("requested_dues")),
+                    "call_date": data.get("call_date"),
+                }
+                index += 1
+
+
+def load_checkpoint(output_path):
+    """
+    Return the record indices already calculated successfully in the output file;
+    failed records (quota, network, ...) are left out so a resume retries them
+    """
+    done = set()
+    output_path = pathlib.Path(output_path)
+    if not output_path.exists():
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                index = result["index"]
+            except (ValueError, KeyError, TypeError):
+                continue  # partial line from a crash; the record will be redone
+            if result.get("results") and "error" not in result:
+                done.add(index)
+            else:
+                done.discard(index)  # a later failure supersedes an earlier line
+    return done
+
+
+def parse_results(raw_output):
+    """
+    Parse '• **Due:** value' lines into a dict, as the API does
+    """
+    results = {}
+    for line in (raw_output or "").splitlines():
+        if "**" in line:
+            try:
+                name_part, value_part = line.split(":**")
+            except ValueError:
+                continue
+            results[name_part.strip("• ").strip().strip("*")] = value_part.strip()
+    return results
+
+
+def _record_call_date(record):
+    """
+    The record's explicit call date, None if it has none; raises ValueError if it does not parse
+    """
+    value = record.get("call_date")
+    if value in (None, ""):
+        return None
+    call_date = parse_date(str(value))
+    if call_date is None:
+        raise ValueError(f"❌ Invalid call_date '{value}'. Use a date such as 2024-11-15 or 15 Nov 2024.")
+    return call_date
+
+
+def process_record(index, record, requested_dues=None):
+    """
+    Calculate one record; errors are returned in the result rather than raised
+    """
+    start_time = time.perf_counter()
+    result = {"index": index, "id": record.get("id")}
+    if record.get("error"):
+        result["error"] = record["error"]
+        result["elapsed"] = 0.0
+        return result
+    try:
+        dues = resolve_dues(record.get("requested_dues") or requested_dues or DUES_TYPES)
+        call_date = _record_call_date(record)  # a bad date fails the record, as the API rejects it
+        chatbot = _get_chatbot()
+        chatbot.set_vessel_data(record["vessel_info"])
+        raw_output = chatbot.calculate_specific_dues(dues, call_date=call_date)
+        result["results"] = parse_results(raw_output)
+        result["tariff_version"] = chatbot.tariff_version.name if chatbot.tariff_version else None
+        if not result["results"]:
+            result["error"] = raw_output
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed"] = round(time.perf_counter() - start_time, 3)
+    return result
+
+
+def _record_version(registry, record):
+    """
+    The tariff version a record will be calculated under, as the chatbot resolves it
+    """
+    if record.get("error"):
+        return None
+    try:
+        call_date = _record_call_date(record) or parse_call_date(record.get("vessel_info"))
+    except ValueError:
+        return None  # fails in process_record
+    return registry.resolve(call_date)
+
+
+def _prepare_versions(registry, extract, versions):
+    """
+    Extract the rules of the versions the input uses, once, before the workers start;
+    returns {version name: error} for those that could not be extracted
+    """
+    unavailable = {}
+    for version in versions:
+        try:
+            registry.get_rules(version, extract=lambda version=version: extract(version=version))
+        except (FileNotFoundError, RuntimeError) as e:
+            unavailable[version.name] = str(e)
+            print(f"❌ Tariff {version.name} unavailable, its records will fail: {e}", file=sys.stderr)
+    return unavailable
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _print_progress(done, total, failed, start_time):
+    elapsed = time.perf_counter() - start_time
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = _format_duration((total - done) / rate) if rate and total else "--:--:--"
+    sys.stderr.write(f"\r📊 {done}/{total} records | {failed} failed | {rate:.2f} rec/s | ETA {eta}   ")
+    sys.stderr.flush()
+
+
+def run_batch(input_path, output_path, workers=4, use_processes=False, requested_dues=None, resume=True):
+    """
+    Stream records from input_path through a worker pool into output_path
+    """
+    from tariff_engine.chatbot import PortDuesChatbot
+    chatbot = PortDuesChatbot()
+
+    done = load_checkpoint(output_path) if resume else set()
+    total = 0
+    used_versions = {}
+    for index, record in iter_records(input_path):
+        if index in done:
+            continue
+        total += 1
+        version = _record_version(chatbot.registry, record)
+        if version is not None:
+            used_versions[version.name] = version
+    if done:
+        print(f"↩️  Resuming: {len(done)} records already in {output_path}", file=sys.stderr)
+
+    # Extract only the versions this input needs, up front, so workers never extract
+    # concurrently; a version that cannot be extracted fails its records, not the run
+    unavailable = _prepare_versions(chatbot.registry, chatbot.extract_rules_for_dues, used_versions.values())
+
+    if use_processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+    else:
+        _shared.update(client=chatbot.client, router=chatbot.router, registry=chatbot.registry)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    completed = failed = 0
+    start_time = time.perf_counter()
+    max_in_flight = workers * 2  # bounded so the input is never fully materialised
+
+    with executor, open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        if resume and out.tell() > 0:
+            with open(output_path, "rb") as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b"\n":
+                    out.write("\n")  # terminate a partial line left by a crash
+        in_flight = set()
+
+        def drain():
+            nonlocal completed, failed, in_flight
+            finished, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                completed += 1
+                failed += 1 if "error" in result else 0
+            out.flush()
+            _print_progress(completed, total, failed, start_time)
+
+        for index, record in iter_records(input_path):
+            if index in done:
+                continue
+            version = _record_version(chatbot.registry, record) if unavailable else None
+            if version is not None and version.name in unavailable:
+                record = {"id": record.get("id"), "error": unavailable[version.name]}
+            in_flight.add(executor.submit(process_record, index, record, requested_dues))
+            if len(in_flight) >= max_in_flight:
+                drain()
+        while in_flight:
+            drain()
+
+    _shared.clear()
+    sys.stderr.write("\n")
+    return completed, failed
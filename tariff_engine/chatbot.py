@@ -6,24 +6,39 @@ import os
 from dotenv import load_dotenv
 import pathlib
 import re
+import threading
+import time
 
 from tariff_engine.constants import DUES_TYPES
 from tariff_engine.prompts import EXTRACT_RULES_PROMPT, CALCULATE_SPECIFIC_DUES_PROMPT
+from tariff_engine.routing import ModelRouter, ROUTE_LOCAL, ROUTE_FAST, ROUTE_PRO, format_amount, local_estimate
+from tariff_engine.stub import StubClient
+from tariff_engine.admission import DeadlineExceeded
+from tariff_engine.registry import TariffRegistry, parse_call_date
+from tariff_engine.resolver import UnknownDuesError, resolve_dues, split_dues_text
+from tariff_engine.profiling import profile_request
 
-LLM_MODEL = "gemini-2.5-pro"
+LLM_MODEL = "gemini-2.5-pro"  # used for rule extraction; calculations are routed per due
 
 load_dotenv()
 
 class PortDuesChatbot:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("❌ GEMINI_API_KEY not found in environment variables. Please check your .env file.")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, client=None, router=None, registry=None):
+        if client is None:
+            if os.getenv('LLM_STUB', '').lower() in ('1', 'true', 'yes'):
+                client = StubClient()
+            else:
+                api_key = os.getenv('GEMINI_API_KEY')
+                if not api_key:
+                    raise ValueError("❌ GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+                client = genai.Client(api_key=api_key)
+        self.client = client
+        self.router = router or ModelRouter()
+        self.registry = registry or TariffRegistry.from_env()
         self.vessel_data = None
-        self.rules_extracted = False
-        self.rules_path = "rubrics.md"
+        self.tariff_version = None  # version used by the last calculation
         self.debug_mode = False
+        self.profile = False  # profile each 'calculate' command in chat()
         
     def extract_response_content(self, response, clean_output=True):
         """
@@ -96,21 +111,22 @@ class PortDuesChatbot:
         
         return content.strip()
 
-    def extract_rules_for_dues(self, specific_dues=None):
+    def extract_rules_for_dues(self, specific_dues=None, version=None):
         """
-        Extract rules for specific dues or all dues
+        Extract rules for specific dues or all dues from a tariff version's PDF (latest by default)
         """
+        version = version or self.registry.default()
         try:
-            filepath = pathlib.Path('Port Tariff.pdf')
+            filepath = pathlib.Path(version.pdf_path)
             if not filepath.exists():
-                return False, "❌ Port Tariff.pdf not found. Please ensure the file is in the current directory."
+                return False, f"❌ {version.pdf_path} not found. Please ensure the file is in the current directory."
             
             dues_to_extract = specific_dues if specific_dues else DUES_TYPES
             rules_list = "\n".join([f'- {due}' for due in dues_to_extract])
             
             prompt = EXTRACT_RULES_PROMPT.format(rules_list=rules_list)
             
-            print("🤖 Extracting rules from PDF...")
+            print(f"🤖 Extracting rules from PDF ({version.name})...")
             response = self.client.models.generate_content(
             model=LLM_MODEL,
             contents=[
@@ -144,79 +160,54 @@ class PortDuesChatbot:
 
             rules_content = self.extract_response_content(response, clean_output=False)
             
-            with open(self.rules_path, "w", encoding="utf-8") as f:
+            # Write to a temporary file and swap it in, so readers never see a partial file
+            temp_path = f"{version.rules_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
                 f.write(rules_content)
-            
-            self.rules_extracted = True
+            os.replace(temp_path, version.rules_path)
             return True, "✅ Rules extracted successfully!"
 
         except Exception as e:
             return False, f"❌ Error extracting rules: {str(e)}"
 
-    def calculate_specific_dues(self, requested_dues, _is_fallback=False):
+    def calculate_specific_dues(self, requested_dues, _is_fallback=False, deadline=None, call_date=None):
         """
-        Calculate specific dues based on vessel data
+        Calculate specific dues based on vessel data, giving up once the deadline passes.
+        The tariff version is picked by call_date, or the arrival date in the vessel data.
         """
         if not self.vessel_data:
             return "❌ Please provide vessel data first using the 'input' command."
         
-        if not self.rules_extracted:
-            if pathlib.Path(self.rules_path).exists():
-                print("✅ Using existing rules file (rubrics.md)")
-                self.rules_extracted = True
-            else:
-                success, message = self.extract_rules_for_dues()
-                if not success:
-                    return message
+        call_date = call_date or parse_call_date(self.vessel_data)
+        version = self.registry.resolve(call_date)
+        if version is None:
+            return f"❌ No tariff version covers the call date {call_date}."
+        self.tariff_version = version
         
         try:
-            with open(self.rules_path, 'r', encoding='utf-8') as f:
-                rules = f.read()
-
-            dues_list = ", ".join(requested_dues)
-            
-            prompt = CALCULATE_SPECIFIC_DUES_PROMPT.format(
-                rules=rules,
-                vessel_data=self.vessel_data,
-                dues_list=dues_list
-            )
-            
-            print("🤖 Calculating requested dues...")
-            response = self.client.models.generate_content(
-            model=LLM_MODEL,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(code_execution=types.ToolCodeExecution())],
-                    temperature=0.1,
-                    safety_settings=[
-                        types.SafetySetting(
-                            category='HARM_CATEGORY_HATE_SPEECH',
-                            threshold='BLOCK_ONLY_HIGH'
-                        ),
-                        types.SafetySetting(
-                            category='HARM_CATEGORY_HARASSMENT',
-                            threshold='BLOCK_ONLY_HIGH'
-                        ),
-                        types.SafetySetting(
-                            category='HARM_CATEGORY_SEXUALLY_EXPLICIT',
-                            threshold='BLOCK_ONLY_HIGH'
-                        ),
-                        types.SafetySetting(
-                            category='HARM_CATEGORY_DANGEROUS_CONTENT',
-                            threshold='BLOCK_ONLY_HIGH'
-                        ),
-                    ],
-                )
-            )
-            
-            # Use clean output unless in debug mode
-            result = self.extract_response_content(response, clean_output=not self.debug_mode)
+            rules = self.registry.get_rules(version, extract=lambda: self.extract_rules_for_dues(version=version))
+        except (FileNotFoundError, RuntimeError) as e:
+            return str(e)
+        
+        try:
+            # Route each due to the local engine, the fast model or the pro model
+            rates = version.local_rates
+            plan = self.router.plan(requested_dues, self.vessel_data, rates)
+            sections = []
+            for route, dues in plan.items():
+                section = self._calculate_route(route, dues, rules, deadline, rates)
+                if section == "RETRY_NEEDED" and len(plan) > 1:
+                    section = "\n".join(f"• **{due}:** Unable to calculate at this time. Please try 'calculate all'." for due in dues)
+                sections.append(section)
+            result = "\n".join(sections)
+            if len(plan) > 1 and not self.debug_mode:
+                result = self._order_results(result, requested_dues)
             
             # If individual calculation failed, try fallback to "calculate all" and extract requested dues
             if result == "RETRY_NEEDED" and len(requested_dues) == 1 and not _is_fallback:
                 try:
                     # Silently try calculating all dues and extract the one we need
-                    all_result = self.calculate_specific_dues(DUES_TYPES, _is_fallback=True)
+                    all_result = self.calculate_specific_dues(DUES_TYPES, _is_fallback=True, deadline=deadline, call_date=call_date)
                     if all_result and all_result != "RETRY_NEEDED":
                         # Extract just the requested due from the "all" result
                         import re
@@ -225,14 +216,112 @@ class PortDuesChatbot:
                         match = re.search(pattern, all_result)
                         if match:
                             return f"• **{requested_due}:** {match.group(1)}"
+                except DeadlineExceeded:
+                    raise
                 except:
                     pass  # If fallback fails, continue with original result
             
             return result if result != "RETRY_NEEDED" else f"• **{requested_dues[0]}:** Unable to calculate at this time. Please try 'calculate all'."
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(str(e)) from e
             return f"❌ Error calculating dues: {str(e)}"
 
+    def _order_results(self, content, requested_dues):
+        """
+        Put result lines from several routes back into the requested order
+        """
+        def position(line):
+            for index, due in enumerate(requested_dues):
+                if f"**{due}:**" in line:
+                    return index
+            return len(requested_dues)
+        return "\n".join(sorted(content.splitlines(), key=position))
+
+    def _calculate_route(self, route, dues, rules, deadline=None, rates=None):
+        """
+        Calculate a group of dues on one route, escalating fast-model answers that fail the sanity check
+        """
+        stats = self.router.stats
+        stats.record_dues(route, len(dues))
+
+        if route == ROUTE_LOCAL:
+            start_time = time.perf_counter()
+            result = "\n".join(format_amount(due, local_estimate(due, self.vessel_data, rates)) for due in dues)
+            stats.record_call(route, ROUTE_LOCAL, time.perf_counter() - start_time)
+            return result
+
+        model = self.router.model_for(route)
+        prompt = CALCULATE_SPECIFIC_DUES_PROMPT.format(
+            rules=rules,
+            vessel_data=self.vessel_data,
+            dues_list=", ".join(dues)
+        )
+        
+        print(f"🤖 Calculating requested dues ({model})...")
+        start_time = time.perf_counter()
+        response = self._generate_calculation(prompt, model, deadline)
+        stats.record_call(route, model, time.perf_counter() - start_time)
+        
+        # Use clean output unless in debug mode
+        result = self.extract_response_content(response, clean_output=not self.debug_mode)
+        if route != ROUTE_FAST:
+            return result
+
+        escalate = self.router.verify(dues, result, self.vessel_data, rates)
+        if not escalate:
+            return result
+
+        print(f"🤖 Escalating to {self.router.pro_model}: {', '.join(escalate)}")
+        escalated = self._calculate_route(ROUTE_PRO, escalate, rules, deadline, rates)
+        if result == "RETRY_NEEDED":
+            return escalated
+        kept = [line for line in result.splitlines()
+                if not any(f"**{due}:**" in line for due in escalate)]
+        return "\n".join(kept + [escalated]).strip()
+
+    def _generate_calculation(self, prompt, model, deadline=None):
+        """
+        Send a calculation prompt to the given model with code execution enabled
+        """
+        http_options = None
+        if deadline is not None:
+            deadline.check()
+            remaining = deadline.remaining()
+            if remaining is not None:
+                # Stop waiting on the model when the caller's deadline passes
+                http_options = types.HttpOptions(timeout=max(1, int(remaining * 1000)))
+        return self.client.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                tools=[types.Tool(code_execution=types.ToolCodeExecution())],
+                temperature=0.1,
+                http_options=http_options,
+                safety_settings=[
+                    types.SafetySetting(
+                        category='HARM_CATEGORY_HATE_SPEECH',
+                        threshold='BLOCK_ONLY_HIGH'
+                    ),
+                    types.SafetySetting(
+                        category='HARM_CATEGORY_HARASSMENT',
+                        threshold='BLOCK_ONLY_HIGH'
+                    ),
+                    types.SafetySetting(
+                        category='HARM_CATEGORY_SEXUALLY_EXPLICIT',
+                        threshold='BLOCK_ONLY_HIGH'
+                    ),
+                    types.SafetySetting(
+                        category='HARM_CATEGORY_DANGEROUS_CONTENT',
+                        threshold='BLOCK_ONLY_HIGH'
+                    ),
+                ],
+            )
+        )
+
     def set_vessel_data(self, data):
         """
         Input for calculations
@@ -320,49 +409,23 @@ class PortDuesChatbot:
                             print("\n🤖 Bot: ❌ Please specify which dues to calculate or use 'calculate all'")
                             continue
                         
-                        # Improved matching logic for specific dues
-                        requested_dues = []
-                        dues_input = dues_text.lower()
+                        try:
+                            requested_dues = resolve_dues(split_dues_text(dues_text))
+                        except UnknownDuesError as e:
+                            print(f"\n🤖 Bot: ❌ {e}")
+                            continue
                         
                         if self.debug_mode:
-                            print(f"\n🔍 Debug: Processing '{dues_text}' -> '{dues_input}'")
-                        
-                        # Add VTS expansion for better matching
-                        input_keywords = dues_input.replace(" dues", "").split()
-                        if ('vessel' in input_keywords and 'traffic' in input_keywords) or \
-                           ('vehicle' in input_keywords and 'traffic' in input_keywords):
-                            dues_input += " vts"
-                            if self.debug_mode:
-                                print(f"🔍 Debug: VTS expansion applied -> '{dues_input}'")
-                        
-                        # Check for exact or partial matches
-                        for due in DUES_TYPES:
-                            due_lower = due.lower()
-                            # Remove "dues" from both for better matching
-                            due_keywords = due_lower.replace(" dues", "").split()
-                            input_keywords = dues_input.replace(" dues", "").split()
-                            
-                            if self.debug_mode:
-                                print(f"🔍 Debug: Checking '{due}' -> {due_keywords} vs {input_keywords}")
-                            
-                            # Check if any significant keyword matches
-                            for input_word in input_keywords:
-                                if len(input_word) > 2:  # Ignore short words like "of"
-                                    if any(input_word in due_word or due_word in input_word 
-                                          for due_word in due_keywords):
-                                        if due not in requested_dues:
-                                            requested_dues.append(due)
-                                            if self.debug_mode:
-                                                print(f"🔍 Debug: ✅ MATCHED '{due}' with '{input_word}'")
-                                        break
-                        
-                        if not requested_dues:
-                            print(f"\n🤖 Bot: ❌ No matching dues found for '{dues_text}'. {self.get_available_dues()}")
-                            continue
+                            print(f"\n🔍 Debug: Resolved '{dues_text}' -> {requested_dues}")
                     
                     print(f"\n🤖 Bot: Calculating: {', '.join(requested_dues)}")
-                    result = self.calculate_specific_dues(requested_dues)
+                    with profile_request("cli", enabled=self.profile) as report:
+                        result = self.calculate_specific_dues(requested_dues)
                     print(f"\n🤖 Bot:\n{result}")
+                    if report.get("skipped"):
+                        print(f"\n⚠️ Profile skipped: {report['skipped']}")
+                    elif report:
+                        print(f"\n📊 Profile: {report['summary']} ({report['wall_time']}s, peak {report['peak_memory'] / 1024:.1f} KiB)")
                 
                 else:
                     print("\n🤖 Bot: ❓ I didn't understand that command. Type 'help' to see available commands.")
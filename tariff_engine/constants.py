@@ -5,4 +5,15 @@ DUES_TYPES = [
     "Port Dues",
     "VTS Dues",
     "Running of Vessel Lines Dues",
-] 
\ No newline at end of file
+] 
+
+# Alternative names and abbreviations accepted for each due, besides the
+# canonical name and the name without "Dues"
+DUES_ALIASES = {
+    "Light Dues": ["lights", "light fee"],
+    "Pilotage Dues": ["pilotage fee", "pilotage service"],
+    "Towage Dues": ["tug", "tugs", "tugboat", "tug assistance", "vessel assistance", "towage fee"],
+    "Port Dues": ["port fee", "port charges"],
+    "VTS Dues": ["vts", "vessel traffic service", "vessel traffic services", "vessel traffic", "vehicle traffic"],
+    "Running of Vessel Lines Dues": ["running of lines", "running lines", "vessel lines", "mooring lines", "line handling"],
+}
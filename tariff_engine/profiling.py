@@ -0,0 +1,142 @@
+"""
+On-demand request profiling for the Port Dues Chatbot
+
+Wraps a single request in cProfile and tracemalloc and writes the reports to
+PROFILE_DIR: `<name>.prof` (pstats, for snakeviz & co.) and `<name>.txt`
+(wall time, peak memory, top functions and top allocation sites). Use with
+LLM_STUB=1 to see the local overhead without model latency.
+
+tracemalloc is process-wide: memory figures include anything else running in
+the process at the same time, such as other API requests in flight. The
+report says how many were.
+"""
+import cProfile
+import io
+import os
+import pathlib
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")  # allows the API X-Profile header
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+# cProfile and tracemalloc are process-wide, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+def _write_reports(base, profiler, snapshot, wall_time, peak_memory, label, note):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    profiler.dump_stats(f"{base}.prof")
+
+    with open(f"{base}.txt", "w", encoding="utf-8") as f:
+        f.write(f"Request: {label}\n")
+        f.write(f"Wall time: {wall_time:.3f}s\n")
+        f.write(f"Peak traced memory: {peak_memory / 1024:.1f} KiB (process-wide)\n")
+        if note:
+            f.write(f"Note: {note}\n")
+        f.write("\n")
+        f.write(f"== Top {PROFILE_TOP} functions by cumulative time ==\n")
+        f.write(stream.getvalue())
+        f.write(f"\n== Top {PROFILE_TOP} allocation sites ==\n")
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_request(label, enabled=True, note=None):
+    """
+    Profile the enclosed block; yields a dict that holds the report paths afterwards.
+    It stays empty if profiling was off, and holds 'skipped' if another request
+    was already being profiled. `note` (or a callable returning it) is written
+    into the report, e.g. how many other requests were in flight.
+    """
+    report = {}
+    if not enabled:
+        yield report
+        return
+    if not _profile_lock.acquire(blocking=False):
+        report["skipped"] = "another request is already being profiled"
+        yield report
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start_time = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            wall_time = time.perf_counter() - start_time
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            directory = pathlib.Path(PROFILE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            # Millisecond timestamp plus a random suffix, so quick successive runs never collide
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+            base = directory / f"{stamp}-{label}-{uuid.uuid4().hex[:6]}"
+            _write_reports(base, profiler, snapshot, wall_time, peak_memory, label, note() if callable(note) else note)
+            report.update({
+                "profile": f"{base}.prof",
+                "summary": f"{base}.txt",
+                "wall_time": round(wall_time, 3),
+                "peak_memory": peak_memory,
+            })
+    finally:
+        _profile_lock.release()
+
+
+def list_reports(directory=PROFILE_DIR):
+    """
+    Return (summary path, wall time line, peak memory line) for each report, newest first
+    """
+    reports = []
+    for path in sorted(pathlib.Path(directory).glob("*.txt"), reverse=True):
+        with open(path, "r", encoding="utf-8") as f:
+            header = [f.readline().strip() for _ in range(3)]
+        reports.append((path, header[1], header[2]))
+    return reports
+
+
+def summarize(path=PROFILE_DIR, sort="cumulative", limit=PROFILE_TOP):
+    """
+    Text summary of one report (.prof/.txt) or a listing of a report directory
+    """
+    path = pathlib.Path(path)
+    if path.is_dir():
+        reports = list_reports(path)
+        if not reports:
+            return f"📭 No profiling reports in {path}"
+        lines = [f"📊 {len(reports)} profiling reports in {path}:"]
+        lines += [f"• {report.stem} | {wall} | {peak}" for report, wall, peak in reports]
+        return "\n".join(lines)
+
+    prof_path, txt_path = path.with_suffix(".prof"), path.with_suffix(".txt")
+    if not prof_path.exists():
+        return f"❌ Profiling report {prof_path} not found."
+
+    stream = io.StringIO()
+    pstats.Stats(str(prof_path), stream=stream).sort_stats(sort).print_stats(limit)
+    output = [stream.getvalue()]
+    if txt_path.exists():
+        text = txt_path.read_text(encoding="utf-8")
+        output.insert(0, "\n".join(text.splitlines()[:3]) + "\n")
+        marker = "== Top"
+        memory_section = text[text.rfind(marker):] if marker in text else ""
+        output.append(memory_section)
+    return "\n".join(output)
@@ -0,0 +1,211 @@
+"""
+Registry of tariff versions for the Port Dues Chatbot
+
+Each financial year's tariff book is a TariffVersion with an effective date
+range, its source PDF and the rules file extracted from it. Rules are loaded
+lazily, kept in a small LRU cache keyed by version and evicted when unused,
+so calls on either side of the April changeover never mix rule sets. Each
+access re-checks the rules file's mtime/size, so a file replaced on disk is
+reloaded rather than served stale.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from tariff_engine.routing import LOCAL_RATES
+
+TARIFF_REGISTRY = os.getenv("TARIFF_REGISTRY", "tariffs.json")
+CACHE_SIZE = int(os.getenv("TARIFF_CACHE_SIZE", "2"))  # rule sets kept in memory
+CACHE_TTL = float(os.getenv("TARIFF_CACHE_TTL", "3600"))  # seconds before an unused rule set is evicted
+
+_DATE_FORMATS = ["%d %b %Y", "%d %B %Y", "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"]
+_DATE_PATTERN = re.compile(r'(\d{1,2}\s+[A-Za-z]{3,9}\s+\d{4}|\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{4})')
+_DATE_LINE_PATTERN = re.compile(r'^\s*(?:Arrival(?:\s+Time)?|ETA|Call\s+Date|Date\s+of\s+Call)\s*:\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+
+
+def parse_date(value):
+    """
+    Parse a date from a string in one of the common vessel-data formats, or None
+    """
+    if isinstance(value, date):
+        return value
+    match = _DATE_PATTERN.search(value or "")
+    if not match:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(match.group(1), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_call_date(vessel_data):
+    """
+    Extract the call (arrival) date from free-text vessel data, or None
+    """
+    match = _DATE_LINE_PATTERN.search(vessel_data or "")
+    return parse_date(match.group(1)) if match else None
+
+
+class TariffVersion:
+    """
+    One tariff book: effective date range, source PDF and extracted rules file
+    """
+    def __init__(self, name, pdf_path, rules_path, effective_from=None, effective_to=None, local_rates=None):
+        self.name = name
+        self.pdf_path = pdf_path
+        self.rules_path = rules_path
+        self.effective_from = effective_from
+        self.effective_to = effective_to
+        self.local_rates = local_rates  # None disables local calculations for this version
+        self.rules_hash = None  # SHA-256 of the rules text last loaded
+
+    def rules_stamp(self):
+        """
+        (mtime, size) of the rules file, or None if it does not exist yet
+        """
+        try:
+            stat = os.stat(self.rules_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def covers(self, call_date):
+        if self.effective_from and call_date < self.effective_from:
+            return False
+        if self.effective_to and call_date > self.effective_to:
+            return False
+        return True
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "effective_from": self.effective_from.isoformat() if self.effective_from else None,
+            "effective_to": self.effective_to.isoformat() if self.effective_to else None,
+            "rules_hash": self.rules_hash[:12] if self.rules_hash else None,
+        }
+
+
+class TariffRegistry:
+    """
+    Resolve call dates to tariff versions and hand out their rules lazily
+    """
+    def __init__(self, versions, cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL):
+        if not versions:
+            raise ValueError("❌ Tariff registry needs at least one version.")
+        # Latest effective date first, so open-ended defaults lose to dated versions
+        self.versions = sorted(versions, key=lambda v: v.effective_from or date.min, reverse=True)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()  # version name -> (rules, rules_stamp, last_used)
+        self._lock = threading.Lock()
+        self._extract_locks = {version.name: threading.Lock() for version in self.versions}
+        self.loads = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load versions from a JSON file: {"versions": [{"name", "pdf", "rules", "effective_from", "effective_to", "local_rates"}]}
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        versions = []
+        for entry in config.get("versions", []):
+            versions.append(TariffVersion(
+                name=entry["name"],
+                pdf_path=entry["pdf"],
+                rules_path=entry["rules"],
+                effective_from=parse_date(entry.get("effective_from")),
+                effective_to=parse_date(entry.get("effective_to")),
+                local_rates=entry.get("local_rates"),
+            ))
+        return cls(versions)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Use TARIFF_REGISTRY if it exists, otherwise the single bundled tariff book
+        """
+        if pathlib.Path(TARIFF_REGISTRY).exists():
+            return cls.from_file(TARIFF_REGISTRY)
+        return cls([TariffVersion("default", "Port Tariff.pdf", "rubrics.md", local_rates=LOCAL_RATES)])
+
+    def default(self):
+        return self.versions[0]
+
+    def resolve(self, call_date=None):
+        """
+        Return the version effective on call_date (today if None), or None
+        """
+        call_date = call_date or date.today()
+        for version in self.versions:
+            if version.covers(call_date):
+                return version
+        return None
+
+    def get(self, name):
+        for version in self.versions:
+            if version.name == name:
+                return version
+        return None
+
+    def _evict_idle(self, now):
+        for key, (_, _, last_used) in list(self._cache.items()):
+            if self.cache_ttl and now - last_used > self.cache_ttl:
+                del self._cache[key]
+                self.evictions += 1
+
+    def get_rules(self, version, extract=None):
+        """
+        Return the rules text for a version, extracting it with `extract()` if the file is missing
+        """
+        key = version.name
+        stamp = version.rules_stamp()
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            if key in self._cache:
+                rules, cached_stamp, _ = self._cache.pop(key)
+                if cached_stamp == stamp:
+                    self._cache[key] = (rules, cached_stamp, now)
+                    return rules
+                # Rules file replaced or removed on disk: drop the stale copy and reload
+
+        # One extraction per version, even with many workers asking at once
+        with self._extract_locks[version.name]:
+            if version.rules_stamp() is None:
+                if extract is None:
+                    raise FileNotFoundError(f"❌ Rules file {version.rules_path} not found for tariff {version.name}.")
+                success, message = extract()
+                if not success:
+                    raise RuntimeError(message)
+            stamp = version.rules_stamp()
+            with open(version.rules_path, "r", encoding="utf-8") as f:
+                rules = f.read()
+            version.rules_hash = hashlib.sha256(rules.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            self._cache[key] = (rules, stamp, time.monotonic())
+            self.loads += 1
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return rules
+
+    def snapshot(self):
+        with self._lock:
+            loaded = list(self._cache)
+            return {
+                "versions": [version.describe() for version in self.versions],
+                "loaded": loaded,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,91 @@
+"""
+Due-name resolver shared by the API, the CLI and batch mode
+
+Maps free-text due names to the canonical DUES_TYPES with a single lookup in
+an alias index built once at import, so unknown names are rejected with
+suggestions before any model call is made.
+"""
+import difflib
+import re
+
+from tariff_engine.constants import DUES_TYPES, DUES_ALIASES
+
+_SUFFIXES = {"dues", "due"}
+
+
+class UnknownDuesError(ValueError):
+    """
+    Raised when requested dues cannot be resolved; carries suggestions per name
+    """
+    def __init__(self, unknown, suggestions):
+        self.unknown = unknown
+        self.suggestions = suggestions  # {name: [canonical dues]}
+        parts = []
+        for name in unknown:
+            hint = suggestions.get(name)
+            parts.append(f"'{name}' (did you mean {' or '.join(hint)}?)" if hint else f"'{name}'")
+        super().__init__(f"Unknown dues: {', '.join(parts)}. Available dues: {', '.join(DUES_TYPES)}")
+
+
+def normalize(name):
+    """
+    Lowercase, drop punctuation and a trailing 'dues'
+    """
+    words = re.sub(r'[^a-z0-9]+', ' ', (name or "").lower()).split()
+    while words and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _build_index():
+    index = {}
+    for due in DUES_TYPES:
+        for name in [due, *DUES_ALIASES.get(due, [])]:
+            index[normalize(name)] = due
+    return index
+
+
+ALIAS_INDEX = _build_index()
+
+
+def resolve(name):
+    """
+    Return the canonical due for a free-text name, or None
+    """
+    return ALIAS_INDEX.get(normalize(name))
+
+
+def suggest(name, limit=2):
+    """
+    Closest canonical dues for an unknown name
+    """
+    matches = difflib.get_close_matches(normalize(name), ALIAS_INDEX.keys(), n=limit * 2, cutoff=0.7)
+    suggestions = []
+    for match in matches:
+        if ALIAS_INDEX[match] not in suggestions:
+            suggestions.append(ALIAS_INDEX[match])
+    return suggestions[:limit]
+
+
+def resolve_dues(names):
+    """
+    Resolve a list of names to canonical dues in request order, without duplicates.
+    Raises UnknownDuesError listing every name that could not be resolved.
+    """
+    resolved, unknown = [], []
+    for name in names:
+        due = resolve(name)
+        if due is None:
+            unknown.append(name)
+        elif due not in resolved:
+            resolved.append(due)
+    if unknown:
+        raise UnknownDuesError(unknown, {name: suggest(name) for name in unknown})
+    return resolved
+
+
+def split_dues_text(text):
+    """
+    Split CLI text like 'port dues, light and vts' into individual names
+    """
+    return [part.strip() for part in re.split(r',|;|\band\b|&', text or "") if part.strip()]
@@ -0,0 +1,235 @@
+"""
+Model routing for the Port Dues Chatbot
+
+Simple formula dues go to the fast model (or are computed locally), complex
+tiered/surcharge dues go to the pro model. Fast-model answers are cross-checked
+against the local engine and escalated to the pro model when they disagree;
+a due the local engine cannot check never goes to the fast model.
+"""
+import math
+import os
+import re
+import threading
+
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gemini-2.5-flash")
+PRO_MODEL = os.getenv("LLM_PRO_MODEL", "gemini-2.5-pro")
+
+# tiered: simple dues with a local check -> fast model (cross-checked), everything else -> pro model
+# local:  like tiered, but simple dues are computed locally when possible
+# pro:    every due goes to the pro model (original behaviour)
+ROUTING_POLICY = os.getenv("LLM_ROUTING_POLICY", "tiered").lower()
+
+# Relative tolerance when comparing a model answer with the local engine
+SANITY_TOLERANCE = float(os.getenv("LLM_SANITY_TOLERANCE", "0.01"))
+
+# Rates the local engine uses for the bundled tariff book; other versions supply their own
+LOCAL_RATES = {
+    "light_per_100_gt": 117.08,
+    "vts_per_gt": 0.54,
+    "vts_per_gt_durban_saldanha": 0.65,
+    "vts_minimum": 235.52,
+}
+
+# Dues whose formula is a single rate/minimum or a flat table lookup
+SIMPLE_DUES = {"Light Dues", "VTS Dues", "Running of Vessel Lines Dues"}
+
+# Wording in the vessel data that pulls simple dues into surcharge/exemption rules
+COMPLEXITY_MARKERS = [
+    "outside ordinary", "after hours", "overtime", "delay", "delayed",
+    "cancel", "cancelled", "canceled", "cancellation", "exempt", "exemption",
+    "coaster", "registered port", "saps", "sandf", "samsa",
+    "naval", "pleasure", "anchorage", "more than 60 days",
+]
+_COMPLEXITY_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(m) for m in COMPLEXITY_MARKERS) + r')\b', re.IGNORECASE)
+
+ROUTE_LOCAL = "local"
+ROUTE_FAST = "fast"
+ROUTE_PRO = "pro"
+
+ROUTING_POLICIES = {"tiered", ROUTE_LOCAL, ROUTE_PRO}
+
+
+def parse_gross_tonnage(vessel_data):
+    """
+    Extract the gross tonnage from free-text vessel data, or None
+    """
+    # Separators stay on one line, so a number on the next line is never glued on
+    match = re.search(r'\bGT[^\S\n]*(?:/[^\S\n]*NT)?[^\S\n]*[:=][^\S\n]*(\d[\d, ]*(?:\.\d+)?)', vessel_data, flags=re.IGNORECASE)
+    if not match:
+        match = re.search(r'gross[^\S\n]+tonnage[^\S\n]*[:=]?[^\S\n]*(\d[\d, ]*(?:\.\d+)?)', vessel_data, flags=re.IGNORECASE)
+    if not match:
+        return None
+    try:
+        return float(re.sub(r'[, ]', '', match.group(1).strip(", ")))
+    except ValueError:
+        return None
+
+
+def parse_port(vessel_data):
+    """
+    Extract the port name from free-text vessel data, or None
+    """
+    match = re.search(r'^\s*Port\s*:\s*(.+)$', vessel_data, flags=re.IGNORECASE | re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def parse_amounts(content):
+    """
+    Parse '• **Due Name:** ZAR 1,234.56' lines into {due name: amount}
+    """
+    amounts = {}
+    for name, value in re.findall(r'\*\*([^*:]+):\*\*\s*[A-Z]{0,3}\s*([\d,]+(?:\.\d+)?)', content or ""):
+        try:
+            amounts[name.strip()] = float(value.replace(",", ""))
+        except ValueError:
+            continue
+    return amounts
+
+
+def format_amount(due, amount):
+    """
+    Format a due in the same bullet style the calculation prompt asks for
+    """
+    return f"• **{due}:** ZAR {amount:,.2f}"
+
+
+def local_estimate(due, vessel_data, rates=LOCAL_RATES):
+    """
+    Compute a simple formula due from the rule book, or None if it needs the model
+    """
+    if not rates:
+        return None
+    gross_tonnage = parse_gross_tonnage(vessel_data or "")
+    if gross_tonnage is None:
+        return None
+
+    if due == "Light Dues":
+        return round(rates["light_per_100_gt"] * math.ceil(gross_tonnage / 100), 2)
+
+    if due == "VTS Dues":
+        port = (parse_port(vessel_data) or "").lower()
+        rate = rates["vts_per_gt_durban_saldanha"] if ("durban" in port or "saldanha" in port) else rates["vts_per_gt"]
+        return round(max(rates["vts_minimum"], rate * gross_tonnage), 2)
+
+    return None
+
+
+class RoutingStats:
+    """
+    Thread-safe per-route call counts, latency and escalation counters
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.escalations = 0
+        self.sanity_checks = 0
+
+    def record_call(self, route, model, latency):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"model": model, "calls": 0, "dues": 0, "total_latency": 0.0, "max_latency": 0.0})
+            entry["model"] = model
+            entry["calls"] += 1
+            entry["total_latency"] += latency
+            entry["max_latency"] = max(entry["max_latency"], latency)
+
+    def record_dues(self, route, count):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"model": None, "calls": 0, "dues": 0, "total_latency": 0.0, "max_latency": 0.0})
+            entry["dues"] += count
+
+    def record_sanity_check(self, escalated):
+        with self._lock:
+            self.sanity_checks += 1
+            if escalated:
+                self.escalations += 1
+
+    def record_escalation(self, count=1):
+        with self._lock:
+            self.escalations += count
+
+    def snapshot(self):
+        with self._lock:
+            routes = {}
+            for route, entry in self._routes.items():
+                calls = entry["calls"]
+                routes[route] = {
+                    "model": entry["model"],
+                    "calls": calls,
+                    "dues": entry["dues"],
+                    "avg_latency": round(entry["total_latency"] / calls, 3) if calls else 0.0,
+                    "max_latency": round(entry["max_latency"], 3),
+                }
+            fast_dues = self._routes.get(ROUTE_FAST, {}).get("dues", 0)
+            return {
+                "routes": routes,
+                "escalations": self.escalations,
+                "sanity_checks": self.sanity_checks,
+                "escalation_rate": round(self.escalations / fast_dues, 3) if fast_dues else 0.0,
+            }
+
+
+class ModelRouter:
+    """
+    Decide which model (or the local engine) handles each requested due
+    """
+    def __init__(self, policy=None, fast_model=None, pro_model=None, tolerance=None):
+        self.policy = (policy or ROUTING_POLICY).lower()
+        if self.policy not in ROUTING_POLICIES:
+            raise ValueError(f"❌ Unknown LLM_ROUTING_POLICY '{self.policy}'. Use one of: {', '.join(sorted(ROUTING_POLICIES))}.")
+        self.fast_model = fast_model or FAST_MODEL
+        self.pro_model = pro_model or PRO_MODEL
+        self.tolerance = SANITY_TOLERANCE if tolerance is None else tolerance
+        self.stats = RoutingStats()
+
+    def snapshot(self):
+        return {"policy": self.policy, **self.stats.snapshot()}
+
+    def model_for(self, route):
+        return self.pro_model if route == ROUTE_PRO else self.fast_model
+
+    def is_complex_request(self, vessel_data):
+        """
+        True if the vessel data mentions surcharge or exemption conditions
+        """
+        return bool(_COMPLEXITY_PATTERN.search(vessel_data or ""))
+
+    def plan(self, requested_dues, vessel_data, rates=LOCAL_RATES):
+        """
+        Split the requested dues into {route: [dues]} preserving request order
+        """
+        plan = {}
+        complex_request = self.is_complex_request(vessel_data)
+        for due in requested_dues:
+            if self.policy == ROUTE_PRO or due not in SIMPLE_DUES or complex_request:
+                route = ROUTE_PRO
+            elif local_estimate(due, vessel_data, rates) is None:
+                route = ROUTE_PRO  # no cheap check for a fast answer (no rates, no GT, or no local formula)
+            elif self.policy == ROUTE_LOCAL:
+                route = ROUTE_LOCAL
+            else:
+                route = ROUTE_FAST
+            plan.setdefault(route, []).append(due)
+        return plan
+
+    def verify(self, dues, content, vessel_data, rates=LOCAL_RATES):
+        """
+        Cross-check a fast-model answer; return the dues that must be escalated
+        """
+        amounts = parse_amounts(content)
+        escalate = []
+        for due in dues:
+            if due not in amounts:
+                self.stats.record_escalation()
+                escalate.append(due)
+                continue
+            expected = local_estimate(due, vessel_data, rates)
+            if expected is None:
+                # plan() keeps these off the fast route; never accept an unchecked answer
+                self.stats.record_escalation()
+                escalate.append(due)
+                continue
+            disagrees = abs(amounts[due] - expected) > self.tolerance * max(expected, 1.0)
+            self.stats.record_sanity_check(disagrees)
+            if disagrees:
+                escalate.append(due)
+        return escalate
@@ -0,0 +1,66 @@
+"""
+Local stand-in for the Gemini client
+
+Mimics `client.models.generate_content(...)` so the chatbot, router and API can
+run without network access or an API key (set LLM_STUB=1).
+"""
+import re
+import time
+from types import SimpleNamespace
+
+from tariff_engine.routing import format_amount, local_estimate
+
+STUB_RULES = "# Stub rules\nRules are not extracted in stub mode."
+
+
+def _stub_response(text):
+    part = SimpleNamespace(text=text, executable_code=None, code_execution_result=None)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+    return SimpleNamespace(candidates=[candidate], text=text)
+
+
+class _StubModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        self._client.calls.append(model)
+        latency = self._client.latency.get(model, self._client.default_latency)
+        http_options = getattr(config, "http_options", None)
+        timeout = getattr(http_options, "timeout", None)
+        if timeout is not None and latency > timeout / 1000:
+            time.sleep(timeout / 1000)
+            raise TimeoutError("Stub request timed out")
+        if latency:
+            time.sleep(latency)
+
+        prompt = contents if isinstance(contents, str) else str(contents[-1])
+        dues_match = re.search(r'Calculate ONLY the final cost amounts for:\s*(.+)', prompt)
+        if not dues_match:
+            return _stub_response(STUB_RULES)
+
+        vessel_match = re.search(r'<input>\n(.*?)\n</input>', prompt, flags=re.DOTALL)
+        vessel_data = vessel_match.group(1) if vessel_match else ""
+        lines = []
+        for due in [d.strip() for d in dues_match.group(1).split(",") if d.strip()]:
+            amount = self._client.answers.get((model, due))
+            if amount is None:
+                amount = local_estimate(due, vessel_data)
+            if amount is None:
+                amount = self._client.default_amount
+            lines.append(format_amount(due, amount))
+        return _stub_response("\n".join(lines))
+
+
+class StubClient:
+    """
+    Deterministic fake client: answers simple dues with the local engine,
+    everything else with `default_amount`, unless overridden in `answers`
+    """
+    def __init__(self, answers=None, latency=None, default_latency=0.0, default_amount=1000.0):
+        self.answers = answers or {}  # {(model, due): amount}
+        self.latency = latency or {}  # {model: seconds}
+        self.default_latency = default_latency
+        self.default_amount = default_amount
+        self.calls = []
+        self.models = _StubModels(self)
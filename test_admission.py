@@ -0,0 +1,113 @@
+"""
+Admission control tests
+"""
+import asyncio
+import time
+
+from tariff_engine.admission import AdmissionController, Deadline, DeadlineExceeded, Overloaded
+
+
+def run_burst(controller, count, hold=0.05, deadline=None):
+    """Start `count` requests at once; return their outcomes in the order they finished"""
+    outcomes = []
+
+    async def request():
+        try:
+            async with controller.slot(deadline):
+                await asyncio.sleep(hold)
+            outcomes.append("ok")
+        except Overloaded:
+            outcomes.append("shed")
+        except DeadlineExceeded:
+            outcomes.append("deadline")
+
+    async def burst():
+        await asyncio.gather(*(request() for _ in range(count)))
+
+    asyncio.run(burst())
+    return outcomes
+
+
+def test_burst_is_shed_immediately():
+    """10 simultaneous requests against 1 slot + 1 queue place: 2 run, 8 are shed at once"""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+    outcomes = run_burst(controller, 10)
+
+    # Shed before either admitted request has finished, i.e. without waiting in the queue
+    assert outcomes == ["shed"] * 8 + ["ok"] * 2
+    snapshot = controller.snapshot()
+    assert snapshot["admitted"] == 2
+    assert snapshot["shed"] == 8
+    assert snapshot["in_flight"] == 0
+    assert snapshot["queue_depth"] == 0
+
+
+def test_queue_timeout_sheds():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    outcomes = run_burst(controller, 2, hold=0.2)
+
+    assert outcomes == ["shed", "ok"]
+    assert controller.snapshot()["shed"] == 1
+
+
+def test_queue_wait_is_bounded_by_deadline():
+    """A request whose deadline ends before the queue timeout gives up at its deadline"""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=60)
+    outcomes = run_burst(controller, 2, hold=0.3, deadline=Deadline(0.05))
+
+    assert outcomes == ["deadline", "ok"]
+    assert controller.snapshot()["shed"] == 0
+
+
+def test_slots_are_reused_after_release():
+    controller = AdmissionController(max_in_flight=2, max_queue=0, queue_timeout=1)
+    for _ in range(3):
+        assert run_burst(controller, 2, hold=0) == ["ok", "ok"]
+
+
+def test_deadline():
+    deadline = Deadline(0.01)
+    deadline.check()
+    time.sleep(0.02)
+    assert deadline.expired()
+    try:
+        deadline.check()
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+
+    cancelled = Deadline()
+    assert cancelled.remaining() is None
+    cancelled.cancel()
+    assert cancelled.expired()
+
+
+def test_api_sheds_burst_with_retry_after(tmp_path, monkeypatch):
+    """4 concurrent API calls against 1 slot + 1 queue place: 2 succeed, 2 get a fast 503"""
+    import concurrent.futures
+    import importlib
+
+    monkeypatch.setenv("LLM_STUB", "1")
+    monkeypatch.chdir(tmp_path)  # api.log and the rules file stay out of the repo
+    (tmp_path / "rubrics.md").write_text("# Rules", encoding="utf-8")
+    from fastapi.testclient import TestClient
+    api = importlib.import_module("api")
+
+    monkeypatch.setattr(api, "admission", AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5))
+    monkeypatch.setattr(api.chatbot.client, "default_latency", 0.5)
+    payload = {"vessel_info": "Port: Durban\nGT: 51300", "requested_dues": ["Port Dues"]}
+
+    with TestClient(api.app) as client:  # one event loop for all requests, as under uvicorn
+        def call():
+            response = client.post("/calculate-tariffs", json=payload)
+            return response.status_code, response.headers.get("retry-after"), time.monotonic()
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            outcomes = list(executor.map(lambda _: call(), range(4)))
+
+    assert sorted(status for status, _, _ in outcomes) == [200, 200, 503, 503]
+    assert all(retry_after is not None for status, retry_after, _ in outcomes if status == 503)
+    # The 503s arrive before the first admitted request finishes, i.e. without queueing
+    first_ok = min(finished for status, _, finished in outcomes if status == 200)
+    assert all(finished < first_ok for status, _, finished in outcomes if status == 503)
+    assert api.admission.snapshot()["shed"] == 2
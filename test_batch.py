@@ -0,0 +1,77 @@
+"""
+Batch mode tests, with the local stub standing in for the models
+"""
+import json
+
+import pytest
+
+from tariff_engine.batch import load_checkpoint, run_batch
+
+VESSEL = "Port: Durban\nGT: 51300\nArrival Time: 15 Nov 2024 10:12"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_STUB", "1")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rubrics.md").write_text("# Rules", encoding="utf-8")
+    return tmp_path
+
+
+def write_jsonl(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_results(path):
+    results = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        result = json.loads(line)
+        results[result["index"]] = result  # latest line per index wins
+    return results
+
+
+def test_malformed_line_becomes_failed_record(workdir):
+    record = json.dumps({"id": "a", "vessel_info": VESSEL, "requested_dues": ["VTS Dues"]})
+    write_jsonl(workdir / "in.jsonl", [record, "{not json", record])
+
+    completed, failed = run_batch(workdir / "in.jsonl", workdir / "out.jsonl", workers=2)
+
+    results = read_results(workdir / "out.jsonl")
+    assert (completed, failed) == (3, 1)
+    assert "Invalid JSON record" in results[1]["error"]
+    assert results[0]["results"] == {"VTS Dues": "ZAR 33,345.00"}
+    assert results[2]["results"] == {"VTS Dues": "ZAR 33,345.00"}
+
+
+def test_resume_retries_failed_records(workdir):
+    record = json.dumps({"id": "a", "vessel_info": VESSEL, "requested_dues": ["VTS Dues"]})
+    write_jsonl(workdir / "in.jsonl", [record, record])
+    write_jsonl(workdir / "out.jsonl", [
+        json.dumps({"index": 0, "id": "a", "results": {"VTS Dues": "ZAR 33,345.00"}}),
+        json.dumps({"index": 1, "id": "a", "error": "429 quota exhausted"}),
+    ])
+
+    assert load_checkpoint(workdir / "out.jsonl") == {0}
+    completed, failed = run_batch(workdir / "in.jsonl", workdir / "out.jsonl", workers=1)
+
+    assert (completed, failed) == (1, 0)
+    assert read_results(workdir / "out.jsonl")[1]["results"] == {"VTS Dues": "ZAR 33,345.00"}
+    assert load_checkpoint(workdir / "out.jsonl") == {0, 1}
+
+
+def test_unparseable_call_date_fails_the_record(workdir):
+    """A call_date that does not parse is an error, not a silent fallback to the arrival date"""
+    record = {"id": "a", "vessel_info": VESSEL, "requested_dues": ["VTS Dues"]}
+    write_jsonl(workdir / "in.jsonl", [
+        json.dumps({**record, "call_date": "15.11.2024"}),
+        json.dumps({**record, "call_date": "2024-13-45"}),
+        json.dumps({**record, "call_date": "2024-11-15"}),
+    ])
+
+    completed, failed = run_batch(workdir / "in.jsonl", workdir / "out.jsonl", workers=1)
+
+    results = read_results(workdir / "out.jsonl")
+    assert (completed, failed) == (3, 2)
+    assert "Invalid call_date '15.11.2024'" in results[0]["error"]
+    assert "Invalid call_date '2024-13-45'" in results[1]["error"]
+    assert results[2]["results"] == {"VTS Dues": "ZAR 33,345.00"}
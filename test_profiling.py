@@ -0,0 +1,63 @@
+"""
+Profiling tests: report naming, busy-lock handling and the report viewer
+"""
+import pytest
+
+from tariff_engine import profiling
+from tariff_engine.profiling import profile_request, summarize
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_quick_reports_do_not_overwrite(profile_dir):
+    """Two CLI profiles in the same second get distinct report names"""
+    summaries = []
+    for _ in range(2):
+        with profile_request("cli") as report:
+            sum(range(1000))
+        summaries.append(report["summary"])
+
+    assert summaries[0] != summaries[1]
+    assert len(list(profile_dir.glob("*.prof"))) == 2
+
+
+def test_report_states_memory_is_process_wide(profile_dir):
+    with profile_request("req", note=lambda: "2 other calculation(s) were in flight") as report:
+        [0] * 1000
+
+    text = open(report["summary"], encoding="utf-8").read()
+    assert "(process-wide)" in text
+    assert "Note: 2 other calculation(s) were in flight" in text
+
+
+def test_busy_lock_marks_report_skipped(profile_dir):
+    with profile_request("outer") as outer:
+        with profile_request("inner") as inner:
+            pass
+        assert "skipped" in inner
+        assert "summary" not in inner
+
+    assert "summary" in outer
+    assert len(list(profile_dir.glob("*.txt"))) == 1
+
+
+def test_disabled_profile_yields_empty_report(profile_dir):
+    with profile_request("cli", enabled=False) as report:
+        pass
+
+    assert report == {}
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_summarize_lists_and_reads_reports(profile_dir):
+    with profile_request("cli") as report:
+        sum(range(1000))
+
+    listing = summarize(profile_dir)
+    assert "1 profiling reports" in listing
+    assert "Wall time" in listing
+    assert "Peak traced memory" in summarize(report["profile"])
@@ -0,0 +1,153 @@
+"""
+Tariff registry tests: version resolution, lazy loading and eviction
+"""
+import json
+import os
+import threading
+from datetime import date
+
+import pytest
+
+from tariff_engine.registry import TariffRegistry, TariffVersion, parse_call_date
+
+
+def make_registry(tmp_path, **kwargs):
+    for name in ("r24.md", "r25.md"):
+        (tmp_path / name).write_text(f"# Rules {name}", encoding="utf-8")
+    versions = [
+        TariffVersion("2024/25", "p24.pdf", str(tmp_path / "r24.md"), date(2024, 4, 1), date(2025, 3, 31)),
+        TariffVersion("2025/26", "p25.pdf", str(tmp_path / "r25.md"), date(2025, 4, 1), date(2026, 3, 31)),
+    ]
+    return TariffRegistry(versions, **kwargs)
+
+
+def test_resolve_by_call_date(tmp_path):
+    registry = make_registry(tmp_path)
+    assert registry.resolve(date(2025, 3, 31)).name == "2024/25"
+    assert registry.resolve(date(2025, 4, 1)).name == "2025/26"
+    assert registry.resolve(date(2023, 1, 1)) is None
+    assert registry.default().name == "2025/26"
+
+
+def test_parse_call_date():
+    assert parse_call_date("Port: Durban\nArrival Time: 15 Nov 2024 10:12") == date(2024, 11, 15)
+    assert parse_call_date("ETA: 2025-04-02") == date(2025, 4, 2)
+    assert parse_call_date("Port: Durban") is None
+
+
+def test_lru_eviction(tmp_path):
+    registry = make_registry(tmp_path, cache_size=1)
+    v25, v24 = registry.versions
+    assert registry.get_rules(v24) == "# Rules r24.md"
+    assert registry.get_rules(v25) == "# Rules r25.md"
+    assert registry.snapshot()["loaded"] == ["2025/26"]
+    assert registry.get_rules(v25) == "# Rules r25.md"
+    assert (registry.loads, registry.evictions) == (2, 1)
+
+
+def test_idle_eviction(tmp_path):
+    registry = make_registry(tmp_path, cache_ttl=0.001)
+    v25, v24 = registry.versions
+    registry.get_rules(v24)
+    threading.Event().wait(0.01)
+    registry.get_rules(v25)
+    assert registry.snapshot()["loaded"] == ["2025/26"]
+
+
+def test_rules_file_replaced_on_disk_is_reloaded(tmp_path):
+    registry = make_registry(tmp_path)
+    version = registry.get("2024/25")
+    registry.get_rules(version)
+    first_hash = version.rules_hash
+
+    (tmp_path / "r24.md").write_text("# Rules r24.md, corrected edition", encoding="utf-8")
+    os.utime(tmp_path / "r24.md", ns=(1, 1))  # make sure the stamp changes on coarse clocks
+
+    assert registry.get_rules(version) == "# Rules r24.md, corrected edition"
+    assert version.rules_hash != first_hash
+
+
+def test_missing_rules_are_extracted_once(tmp_path):
+    registry = make_registry(tmp_path)
+    version = registry.get("2025/26")
+    os.remove(version.rules_path)
+    calls = []
+
+    def extract():
+        calls.append(1)
+        (tmp_path / "r25.md").write_text("# Extracted", encoding="utf-8")
+        return True, "ok"
+
+    threads = [threading.Thread(target=registry.get_rules, args=(version, extract)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert registry.get_rules(version) == "# Extracted"
+
+
+def test_missing_rules_without_extractor(tmp_path):
+    registry = make_registry(tmp_path)
+    version = registry.get("2025/26")
+    os.remove(version.rules_path)
+    with pytest.raises(FileNotFoundError):
+        registry.get_rules(version)
+
+
+def test_batch_extracts_each_version_once(tmp_path, monkeypatch):
+    """Records dated into a non-default version with missing rules: one extraction, shared registry"""
+    from tariff_engine.batch import run_batch
+    from tariff_engine.chatbot import PortDuesChatbot
+
+    monkeypatch.setenv("LLM_STUB", "1")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "p24.pdf").write_bytes(b"%PDF-1.4 stub")
+    (tmp_path / "r25.md").write_text("# Rules", encoding="utf-8")
+    (tmp_path / "tariffs.json").write_text(json.dumps({"versions": [
+        {"name": "2024/25", "pdf": "p24.pdf", "rules": "r24.md", "effective_from": "2024-04-01", "effective_to": "2025-03-31"},
+        {"name": "2025/26", "pdf": "p25.pdf", "rules": "r25.md", "effective_from": "2025-04-01", "effective_to": "2026-03-31"},
+    ]}), encoding="utf-8")
+    (tmp_path / "in.jsonl").write_text("".join(
+        json.dumps({"vessel_info": "Port: Durban\nGT: 51300", "call_date": "2024-11-15", "requested_dues": ["Port Dues"]}) + "\n"
+        for _ in range(8)
+    ), encoding="utf-8")
+
+    extractions = []
+    original = PortDuesChatbot.extract_rules_for_dues
+
+    def counting_extract(self, *args, **kwargs):
+        extractions.append(kwargs.get("version").name)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PortDuesChatbot, "extract_rules_for_dues", counting_extract)
+    completed, failed = run_batch(tmp_path / "in.jsonl", tmp_path / "out.jsonl", workers=4)
+
+    assert (completed, failed) == (8, 0)
+    assert extractions == ["2024/25"]
+    results = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert {result["tariff_version"] for result in results} == {"2024/25"}
+
+
+def test_batch_skips_unused_unextractable_version(tmp_path, monkeypatch):
+    """A version no record needs is never extracted; one that cannot be extracted fails only its records"""
+    from tariff_engine.batch import run_batch
+
+    monkeypatch.setenv("LLM_STUB", "1")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "r25.md").write_text("# Rules", encoding="utf-8")
+    (tmp_path / "tariffs.json").write_text(json.dumps({"versions": [
+        {"name": "2024/25", "pdf": "missing24.pdf", "rules": "r24.md", "effective_from": "2024-04-01", "effective_to": "2025-03-31"},
+        {"name": "2025/26", "pdf": "p25.pdf", "rules": "r25.md", "effective_from": "2025-04-01", "effective_to": "2026-03-31"},
+    ]}), encoding="utf-8")
+    record = {"vessel_info": "Port: Durban\nGT: 51300", "call_date": "2025-06-01", "requested_dues": ["VTS Dues"]}
+    (tmp_path / "in.jsonl").write_text(json.dumps(record) + "\n", encoding="utf-8")
+
+    assert run_batch(tmp_path / "in.jsonl", tmp_path / "out.jsonl", workers=2) == (1, 0)
+
+    record["call_date"] = "2024-11-15"
+    (tmp_path / "in.jsonl").write_text(json.dumps(record) + "\n" + json.dumps({**record, "call_date": "2025-06-01"}) + "\n", encoding="utf-8")
+    assert run_batch(tmp_path / "in.jsonl", tmp_path / "out2.jsonl", workers=2) == (2, 1)
+    results = {r["index"]: r for r in map(json.loads, (tmp_path / "out2.jsonl").read_text(encoding="utf-8").splitlines())}
+    assert "missing24.pdf not found" in results[0]["error"]
+    assert results[1]["tariff_version"] == "2025/26"
@@ -0,0 +1,42 @@
+"""
+Due-name resolver tests
+"""
+import pytest
+
+from tariff_engine.constants import DUES_TYPES
+from tariff_engine.resolver import UnknownDuesError, resolve, resolve_dues, split_dues_text, suggest
+
+
+def test_canonical_names_and_short_forms():
+    for due in DUES_TYPES:
+        assert resolve(due) == due
+        assert resolve(due.upper()) == due
+        assert resolve(due.replace(" Dues", "")) == due
+
+
+def test_aliases():
+    assert resolve("vts") == "VTS Dues"
+    assert resolve("Vessel Traffic Services") == "VTS Dues"
+    assert resolve("tugs") == "Towage Dues"
+    assert resolve("running of lines") == "Running of Vessel Lines Dues"
+
+
+def test_resolve_dues_keeps_order_and_drops_duplicates():
+    assert resolve_dues(["vts", "Light", "VTS Dues"]) == ["VTS Dues", "Light Dues"]
+
+
+def test_unknown_names_are_rejected_with_suggestions():
+    with pytest.raises(UnknownDuesError) as error:
+        resolve_dues(["Pilot dues", "xyz", "port"])
+    assert error.value.unknown == ["Pilot dues", "xyz"]
+    assert error.value.suggestions == {"Pilot dues": ["Pilotage Dues"], "xyz": []}
+    assert "did you mean Pilotage Dues?" in str(error.value)
+    assert isinstance(error.value, ValueError)
+
+
+def test_suggest():
+    assert suggest("towge") == ["Towage Dues"]
+
+
+def test_split_dues_text():
+    assert split_dues_text("port dues, light and vts; tugs & pilotage") == ["port dues", "light", "vts", "tugs", "pilotage"]
@@ -0,0 +1,114 @@
+"""
+Model routing tests, with the local stub standing in for both models
+"""
+import pytest
+
+from tariff_engine.chatbot import PortDuesChatbot
+from tariff_engine.registry import TariffRegistry, TariffVersion
+from tariff_engine.routing import (
+    FAST_MODEL, PRO_MODEL, LOCAL_RATES, ModelRouter, local_estimate, parse_amounts, parse_gross_tonnage,
+)
+from tariff_engine.stub import StubClient
+
+VESSEL = """Port: Durban
+Vessel Name: SUDESTADA
+Classification Society: Registro Italiano Navale
+GT / NT: 51,300 / 31,192
+Arrival Time: 15 Nov 2024 10:12"""
+
+
+def make_chatbot(tmp_path, policy="tiered", answers=None):
+    rules = tmp_path / "rules.md"
+    rules.write_text("# Rules", encoding="utf-8")
+    registry = TariffRegistry([TariffVersion("test", str(tmp_path / "tariff.pdf"), str(rules), local_rates=LOCAL_RATES)])
+    client = StubClient(answers=answers)
+    chatbot = PortDuesChatbot(client=client, router=ModelRouter(policy=policy), registry=registry)
+    chatbot.set_vessel_data(VESSEL)
+    return chatbot, client
+
+
+def test_local_estimate_matches_rule_book():
+    """Light and VTS dues for the README example vessel"""
+    assert local_estimate("Light Dues", VESSEL) == 60062.04
+    assert local_estimate("VTS Dues", VESSEL) == 33345.00
+    assert local_estimate("Port Dues", VESSEL) is None
+
+
+def test_gross_tonnage_stays_on_its_line():
+    """A number on the following line is not glued onto the tonnage"""
+    assert parse_gross_tonnage("GT: 51,300\n2010 built") == 51300.0
+    assert parse_gross_tonnage("GT:\n2010 built") is None
+    assert local_estimate("Light Dues", "Port: Durban\nGT: 51,300\n2010 built") == 60062.04
+
+
+def test_fast_path_agreement(tmp_path):
+    """Simple dues go to the fast model and are accepted when they match the local check"""
+    chatbot, client = make_chatbot(tmp_path)
+    result = parse_amounts(chatbot.calculate_specific_dues(["Light Dues", "VTS Dues"]))
+
+    assert client.calls == [FAST_MODEL]
+    assert result == {"Light Dues": 60062.04, "VTS Dues": 33345.00}
+    snapshot = chatbot.router.snapshot()
+    assert snapshot["sanity_checks"] == 2
+    assert snapshot["escalations"] == 0
+    assert snapshot["routes"]["fast"]["calls"] == 1
+
+
+def test_escalation_on_disagreement(tmp_path):
+    """A fast answer that disagrees with the local check is replaced by the pro model's"""
+    chatbot, client = make_chatbot(tmp_path, answers={(FAST_MODEL, "VTS Dues"): 99.0})
+    output = chatbot.calculate_specific_dues(["Light Dues", "VTS Dues"])
+
+    assert client.calls == [FAST_MODEL, PRO_MODEL]
+    assert parse_amounts(output) == {"Light Dues": 60062.04, "VTS Dues": 33345.00}
+    assert output.index("Light Dues") < output.index("VTS Dues")
+    snapshot = chatbot.router.snapshot()
+    assert snapshot["escalations"] == 1
+    assert snapshot["escalation_rate"] == 0.5
+
+
+def test_complex_dues_go_to_pro(tmp_path):
+    chatbot, client = make_chatbot(tmp_path)
+    chatbot.calculate_specific_dues(["Port Dues", "Light Dues"])
+
+    assert sorted(client.calls) == sorted([FAST_MODEL, PRO_MODEL])
+    assert chatbot.router.snapshot()["routes"]["pro"]["dues"] == 1
+
+
+def test_local_policy_skips_the_model(tmp_path):
+    chatbot, client = make_chatbot(tmp_path, policy="local")
+    result = parse_amounts(chatbot.calculate_specific_dues(["Light Dues", "VTS Dues"]))
+
+    assert client.calls == []
+    assert result == {"Light Dues": 60062.04, "VTS Dues": 33345.00}
+
+
+def test_pro_policy_sends_everything_to_pro(tmp_path):
+    chatbot, client = make_chatbot(tmp_path, policy="pro")
+    chatbot.calculate_specific_dues(["Light Dues", "VTS Dues", "Port Dues"])
+
+    assert client.calls == [PRO_MODEL]
+
+
+def test_complexity_markers():
+    """Surcharge/exemption wording sends simple dues to pro; 'Navale' is not 'naval'"""
+    router = ModelRouter(policy="tiered")
+    assert router.plan(["VTS Dues"], VESSEL) == {"fast": ["VTS Dues"]}
+    assert router.plan(["VTS Dues"], VESSEL + "\nDeparture delayed by 3 hours") == {"pro": ["VTS Dues"]}
+    assert router.plan(["Light Dues"], VESSEL + "\nStatus: SAMSA vessel") == {"pro": ["Light Dues"]}
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ModelRouter(policy="lcoal")
+
+
+def test_unchecked_dues_go_to_pro():
+    """A fast answer is only accepted when the local engine can check it"""
+    router = ModelRouter(policy="tiered")
+    assert router.plan(["Running of Vessel Lines Dues", "VTS Dues"], VESSEL) == {
+        "pro": ["Running of Vessel Lines Dues"], "fast": ["VTS Dues"],
+    }
+    assert router.plan(["VTS Dues"], VESSEL, rates=None) == {"pro": ["VTS Dues"]}
+    assert router.plan(["VTS Dues"], "Port: Durban") == {"pro": ["VTS Dues"]}
+    assert ModelRouter(policy="local").plan(["Light Dues"], VESSEL, rates=None) == {"pro": ["Light Dues"]}